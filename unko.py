@@ -1,56 +1,68 @@
+import asyncio
+import atexit
 import logging
 import os
-from pathlib import Path
-from telegram import Update
-from telegram.ext import Application, MessageHandler, filters, ContextTypes
-from datetime import datetime, timedelta
-from typing import Dict, List
+import re
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import SimpleQueue
+from telegram import MessageEntity, Update, User
+from telegram.ext import AIORateLimiter, Application, MessageHandler, filters, ContextTypes
+from cachetools import TTLCache
+from dotenv import load_dotenv
+from typing import List, Optional, Tuple
 
 # Configure logging:
 # - Console: warnings/errors only
-# - File: everything (debug+)
+# - File: everything at LOG_LEVEL and above (set LOG_LEVEL=DEBUG for per-message details)
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
 
 root_logger = logging.getLogger()
 root_logger.setLevel(logging.DEBUG)
 
-file_handler = logging.FileHandler("bot_debug.log", encoding="utf-8")
+file_handler = RotatingFileHandler(
+    "bot_debug.log",
+    maxBytes=50 * 1024 * 1024,
+    backupCount=5,
+    encoding="utf-8"
+)
 file_handler.setLevel(logging.DEBUG)
 file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
 
+# The file is written from a background thread, so logging from the event loop
+# is just a queue put and never blocks on disk I/O.
+log_queue: SimpleQueue = SimpleQueue()
+queue_handler = QueueHandler(log_queue)
+queue_listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+queue_listener.start()
+atexit.register(queue_listener.stop)
+
 console_handler = logging.StreamHandler()
 console_handler.setLevel(logging.WARNING)
 console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
 
 # Avoid duplicate handlers if the script is reloaded in some environments
 root_logger.handlers.clear()
-root_logger.addHandler(file_handler)
+root_logger.addHandler(queue_handler)
 root_logger.addHandler(console_handler)
 
 logger = logging.getLogger(__name__)
 
 # --- Env loading ---
-def load_env(path: str = ".env"):
-    env_path = Path(path)
-    if not env_path.exists():
-        return
-    for line in env_path.read_text(encoding="utf-8").splitlines():
-        line = line.strip()
-        if not line or line.startswith("#") or "=" not in line:
-            continue
-        key, value = line.split("=", 1)
-        # Do not overwrite existing environment variables
-        os.environ.setdefault(key.strip(), value.strip())
+# Load environment variables (including BOT_TOKEN) from .env.
+# Existing environment variables are not overwritten.
+load_dotenv(".env", override=False)
 
-# Load environment variables (including BOT_TOKEN)
-load_env()
+# Per-message details are logged at DEBUG and only formatted when that level is enabled.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+root_logger.setLevel(LOG_LEVEL)
 
 # Keep third-party libraries quieter on the console while preserving full detail in the file.
 # (They still propagate to root_logger, but console_handler filters below WARNING.)
-logging.getLogger("httpx").setLevel(logging.DEBUG)
-logging.getLogger("httpcore").setLevel(logging.DEBUG)
-logging.getLogger("telegram").setLevel(logging.DEBUG)
-logging.getLogger("telegram.ext").setLevel(logging.DEBUG)
+logging.getLogger("httpx").setLevel(LOG_LEVEL)
+logging.getLogger("httpcore").setLevel(LOG_LEVEL)
+logging.getLogger("telegram").setLevel(LOG_LEVEL)
+logging.getLogger("telegram.ext").setLevel(LOG_LEVEL)
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
@@ -65,32 +77,64 @@ HAUPTGRUPPE_TOPIC_ID = int(os.getenv("HAUPTGRUPPE_TOPIC_ID", "2"))
 BIETE_TOPIC_ID = int(os.getenv("BIETE_TOPIC_ID", "3"))
 SUCHE_TOPIC_ID = int(os.getenv("SUCHE_TOPIC_ID", "4"))
 
+# Topic names for log output
+TOPIC_NAMES = {BIETE_TOPIC_ID: "Biete", SUCHE_TOPIC_ID: "Suche"}
+
+# Hashtags that select the target topics (matched case-insensitively)
+HASHTAG_RE = re.compile(r"#(biete|suche)\b", re.IGNORECASE)
+
 # Time window (in minutes) for context-based forwarding
 # Messages from the same user within this time will be forwarded to the same topics
 CONTEXT_TIME_WINDOW_MINUTES = int(os.getenv("CONTEXT_TIME_WINDOW_MINUTES", "5"))
 
-# User context tracking: {user_id: {"topics": [topic_ids], "timestamp": datetime}}
-user_forwarding_context: Dict[int, Dict] = {}
+# HTTP connection pools
+# Outbound sends (send_message, send_photo, ...) and getUpdates long-polling use
+# separate pools, so polling can never starve the sends of a fan-out.
+CONNECTION_POOL_SIZE = int(os.getenv("CONNECTION_POOL_SIZE", "32"))
+POOL_TIMEOUT = float(os.getenv("POOL_TIMEOUT", "10.0"))
+CONNECT_TIMEOUT = float(os.getenv("CONNECT_TIMEOUT", "10.0"))
+READ_TIMEOUT = float(os.getenv("READ_TIMEOUT", "30.0"))
+GET_UPDATES_CONNECTION_POOL_SIZE = int(os.getenv("GET_UPDATES_CONNECTION_POOL_SIZE", "4"))
+GET_UPDATES_POOL_TIMEOUT = float(os.getenv("GET_UPDATES_POOL_TIMEOUT", "5.0"))
+
+# Webhook mode
+# With USE_WEBHOOK=true Telegram pushes updates to WEBHOOK_URL instead of the bot
+# long-polling getUpdates. WEBHOOK_URL is the public base URL; the bot token is
+# appended as the path.
+USE_WEBHOOK = os.getenv("USE_WEBHOOK", "false").strip().lower() in ("1", "true", "yes")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8443"))
+if USE_WEBHOOK and not WEBHOOK_URL:
+    raise RuntimeError("USE_WEBHOOK is enabled but WEBHOOK_URL is not set. Please define it in .env or environment.")
+
+# Upper bound on the number of users whose context is kept in memory
+CTX_MAX_USERS = int(os.getenv("CTX_MAX_USERS", "10000"))
+
+# User context tracking: {user_id: {"topics": [topic_ids], "timestamp": monotonic seconds}}
+# Entries expire after CONTEXT_TIME_WINDOW_MINUTES and the least recently used
+# ones are evicted once CTX_MAX_USERS is reached, so inactive users don't leak.
+user_forwarding_context: TTLCache = TTLCache(
+    maxsize=CTX_MAX_USERS,
+    ttl=CONTEXT_TIME_WINDOW_MINUTES * 60,
+    timer=time.monotonic
+)
 
 def get_active_topics_for_user(user_id: int) -> List[int]:
     """
     Get the list of topics this user should forward to based on recent context.
     Returns empty list if context has expired.
     """
-    if user_id not in user_forwarding_context:
+    context_data = user_forwarding_context.get(user_id)
+    if context_data is None:
         return []
 
-    context_data = user_forwarding_context[user_id]
-    timestamp = context_data["timestamp"]
-    time_diff = datetime.now() - timestamp
-
-    if time_diff > timedelta(minutes=CONTEXT_TIME_WINDOW_MINUTES):
-        # Context expired, remove it
-        logger.info(f"Context expired for user {user_id} (age: {time_diff})")
-        del user_forwarding_context[user_id]
-        return []
-
-    logger.info(f"Active context for user {user_id}: topics {context_data['topics']} (age: {time_diff})")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Active context for user %s: topics %s (age: %.1fs)",
+            user_id, context_data["topics"], time.monotonic() - context_data["timestamp"]
+        )
     return context_data["topics"]
 
 def update_user_context(user_id: int, topics: List[int]):
@@ -99,249 +143,211 @@ def update_user_context(user_id: int, topics: List[int]):
     """
     user_forwarding_context[user_id] = {
         "topics": topics,
-        "timestamp": datetime.now()
+        "timestamp": time.monotonic()
     }
-    logger.info(f"Updated context for user {user_id}: topics {topics}")
+    logger.debug("Updated context for user %s: topics %s", user_id, topics)
+
+def utf16_len(text: str) -> int:
+    """
+    Length of text in UTF-16 code units, which is what Telegram entity offsets count.
+    """
+    return len(text.encode("utf-16-le")) // 2
+
+def build_forward_text(user: User, text: str) -> Tuple[str, List[MessageEntity]]:
+    """
+    Build the "📨 Von <user>" text for a forwarded message.
+    The user's name is linked via a text_mention entity instead of Markdown, so neither
+    the name nor the message text can break parsing and Telegram skips parsing entirely.
+    """
+    prefix = "📨 Von "
+    forward_text = f"{prefix}{user.first_name}"
+    if text.strip():
+        forward_text += f":\n\n{text}"
+    mention = MessageEntity(
+        type=MessageEntity.TEXT_MENTION,
+        offset=utf16_len(prefix),
+        length=utf16_len(user.first_name),
+        user=user
+    )
+    return forward_text, [mention]
+
+async def send_text_to_topic(
+    context: ContextTypes.DEFAULT_TYPE,
+    topic_id: int,
+    text: str,
+    entities: List[MessageEntity]
+):
+    """
+    Send an already formatted text message to a specific topic.
+    """
+    result = await context.bot.send_message(
+        chat_id=GROUP_ID,
+        message_thread_id=topic_id,
+        text=text,
+        entities=entities
+    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "✓ Sent text to %s topic. Message ID: %s",
+            TOPIC_NAMES.get(topic_id, str(topic_id)), result.message_id
+        )
+
+# Message attributes that carry media, in detection order
+MEDIA_ATTRS = ("photo", "video", "document", "audio", "voice", "video_note", "sticker")
+
+# Media types that can't carry a caption; the header is sent as a separate message
+CAPTIONLESS_MEDIA = frozenset({"video_note", "sticker"})
+
+def get_media_kind(message) -> Optional[str]:
+    """
+    Return the media attribute set on the message (e.g. "photo"), or None for pure text.
+    """
+    return next((attr for attr in MEDIA_ATTRS if getattr(message, attr)), None)
 
 async def forward_media_to_topic(
     context: ContextTypes.DEFAULT_TYPE,
     message,
     topic_id: int,
-    user_link: str
+    caption_text: str,
+    caption_entities: List[MessageEntity],
+    media_kind: str
 ):
     """
     Forward a media message (photo, video, document, etc.) to a specific topic.
     """
-    try:
-        logger.info(f"Forwarding media to topic {topic_id}")
-
-        caption_text = f"📨 Von {user_link}"
-        if message.caption:
-            caption_text += f":\n\n{message.caption}"
-
-        # Handle different media types
-        if message.photo:
-            # Get the largest photo
-            photo = message.photo[-1]
-            result = await context.bot.send_photo(
-                chat_id=GROUP_ID,
-                message_thread_id=topic_id,
-                photo=photo.file_id,
-                caption=caption_text,
-                parse_mode="Markdown"
-            )
-            logger.info(f"✓ Successfully sent photo to topic {topic_id}. Message ID: {result.message_id}")
-
-        elif message.video:
-            result = await context.bot.send_video(
-                chat_id=GROUP_ID,
-                message_thread_id=topic_id,
-                video=message.video.file_id,
-                caption=caption_text,
-                parse_mode="Markdown"
-            )
-            logger.info(f"✓ Successfully sent video to topic {topic_id}. Message ID: {result.message_id}")
-
-        elif message.document:
-            result = await context.bot.send_document(
-                chat_id=GROUP_ID,
-                message_thread_id=topic_id,
-                document=message.document.file_id,
-                caption=caption_text,
-                parse_mode="Markdown"
-            )
-            logger.info(f"✓ Successfully sent document to topic {topic_id}. Message ID: {result.message_id}")
-
-        elif message.audio:
-            result = await context.bot.send_audio(
-                chat_id=GROUP_ID,
-                message_thread_id=topic_id,
-                audio=message.audio.file_id,
-                caption=caption_text,
-                parse_mode="Markdown"
-            )
-            logger.info(f"✓ Successfully sent audio to topic {topic_id}. Message ID: {result.message_id}")
-
-        elif message.voice:
-            result = await context.bot.send_voice(
-                chat_id=GROUP_ID,
-                message_thread_id=topic_id,
-                voice=message.voice.file_id,
-                caption=caption_text,
-                parse_mode="Markdown"
-            )
-            logger.info(f"✓ Successfully sent voice to topic {topic_id}. Message ID: {result.message_id}")
-
-        elif message.video_note:
-            # Video notes don't support captions, so we send a separate message
-            result = await context.bot.send_video_note(
-                chat_id=GROUP_ID,
-                message_thread_id=topic_id,
-                video_note=message.video_note.file_id
-            )
-            await context.bot.send_message(
-                chat_id=GROUP_ID,
-                message_thread_id=topic_id,
-                text=caption_text,
-                parse_mode="Markdown"
-            )
-            logger.info(f"✓ Successfully sent video note to topic {topic_id}. Message ID: {result.message_id}")
-
-        elif message.sticker:
-            result = await context.bot.send_sticker(
-                chat_id=GROUP_ID,
-                message_thread_id=topic_id,
-                sticker=message.sticker.file_id
-            )
-            if message.caption:
-                await context.bot.send_message(
+    # copy_message reuses the original media server-side, whatever its type
+    if media_kind in CAPTIONLESS_MEDIA:
+        copy = context.bot.copy_message(
+            chat_id=GROUP_ID,
+            message_thread_id=topic_id,
+            from_chat_id=message.chat_id,
+            message_id=message.message_id
+        )
+        if media_kind == "video_note" or message.caption:
+            # The two calls are independent, so overlap them instead of paying two round-trips.
+            # The header is sent silently so members are only notified once.
+            result, _ = await asyncio.gather(
+                copy,
+                context.bot.send_message(
                     chat_id=GROUP_ID,
                     message_thread_id=topic_id,
                     text=caption_text,
-                    parse_mode="Markdown"
+                    entities=caption_entities,
+                    disable_notification=True
                 )
-            logger.info(f"✓ Successfully sent sticker to topic {topic_id}. Message ID: {result.message_id}")
+            )
+        else:
+            result = await copy
+    else:
+        result = await context.bot.copy_message(
+            chat_id=GROUP_ID,
+            message_thread_id=topic_id,
+            from_chat_id=message.chat_id,
+            message_id=message.message_id,
+            caption=caption_text,
+            caption_entities=caption_entities
+        )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "✓ Copied %s to %s topic. Message ID: %s",
+            media_kind, TOPIC_NAMES.get(topic_id, str(topic_id)), result.message_id
+        )
 
-    except Exception as e:
-        logger.error(f"✗ ERROR forwarding media to topic {topic_id}: {type(e).__name__}: {e}", exc_info=True)
+async def forward_to_topics(
+    context: ContextTypes.DEFAULT_TYPE,
+    message,
+    topic_ids: List[int],
+    text: str,
+    media_kind: Optional[str]
+):
+    """
+    Send the text and/or media of a message to all given topics concurrently.
+    Failed sends are logged; rate limits (429) are already retried by the AIORateLimiter.
+    """
+    # Built once per message and shared by every send of the fan-out
+    forward_text, forward_entities = build_forward_text(message.from_user, text)
+
+    sends = []
+    if text.strip():
+        sends += [
+            ("text", topic_id, send_text_to_topic(context, topic_id, forward_text, forward_entities))
+            for topic_id in topic_ids
+        ]
+    if media_kind:
+        sends += [
+            (media_kind, topic_id,
+             forward_media_to_topic(context, message, topic_id, forward_text, forward_entities, media_kind))
+            for topic_id in topic_ids
+        ]
+
+    results = await asyncio.gather(*(send for _, _, send in sends), return_exceptions=True)
+    for (what, topic_id, _), result in zip(sends, results):
+        if isinstance(result, Exception):
+            logger.error(
+                "✗ ERROR sending %s to topic %s: %s: %s",
+                what, topic_id, type(result).__name__, result, exc_info=result
+            )
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    logger.info("=" * 60)
-    logger.info("NEW MESSAGE RECEIVED")
-    logger.info(f"Update ID: {update.update_id}")
-    
+    # FORWARD_FILTER guarantees a new message with content from the Hauptgruppe topic
     message = update.message
-    
-    if not message:
-        logger.warning("Message is None, skipping")
-        return
-    
-    logger.info(f"Message ID: {message.message_id}")
-    logger.info(f"Chat ID: {message.chat_id} (Expected: {GROUP_ID})")
-    logger.info(f"Message Thread ID: {message.message_thread_id} (Expected: {HAUPTGRUPPE_TOPIC_ID})")
-    logger.info(f"Chat Type: {message.chat.type}")
-    
-    if message.chat_id != GROUP_ID:
-        logger.warning(f"Chat ID mismatch! Got {message.chat_id}, expected {GROUP_ID}. Skipping.")
-        return
-    
-    logger.info("✓ Chat ID matches")
-    
-    # Only process messages from the Hauptgruppe topic
-    if message.message_thread_id != HAUPTGRUPPE_TOPIC_ID:
-        logger.info(
-            f"Message thread ID {message.message_thread_id} != {HAUPTGRUPPE_TOPIC_ID}. "
-            "Not from Hauptgruppe topic, skipping."
-        )
-        return
-    
-    logger.info("✓ Message is from Hauptgruppe topic")
-    
-    text = message.text or message.caption or ""
-    logger.info(f"Message text: {repr(text)}")
-    logger.info(f"Text length: {len(text)}")
-    
-    user = message.from_user
-    if user:
-        logger.info(f"User ID: {user.id}")
-        logger.info(f"User name: {user.first_name} {user.last_name or ''}")
-        logger.info(f"Username: @{user.username or 'N/A'}")
-    else:
-        logger.warning("User is None!")
-    
-    user_link = f"[{user.first_name}](tg://user?id={user.id})"
 
-    text_lower = text.lower()
-    logger.info(f"Text (lowercase): {repr(text_lower)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("=" * 60)
+        logger.debug("NEW MESSAGE RECEIVED")
+        logger.debug("Update ID: %s", update.update_id)
+        logger.debug("Message ID: %s", message.message_id)
+
+    text = message.text or message.caption or ""
 
     # Determine if message has media
-    has_media = any([
-        message.photo,
-        message.video,
-        message.document,
-        message.audio,
-        message.voice,
-        message.video_note,
-        message.sticker
-    ])
-    logger.info(f"Message has media: {has_media}")
+    media_kind = get_media_kind(message)
+    has_media = media_kind is not None
+
+    # Nothing to forward (e.g. whitespace-only text or an unsupported media type)
+    if not has_media and not text.strip():
+        logger.debug("Message has no forwardable content, skipping")
+        return
+
+    user = message.from_user
+    if not user:
+        logger.warning("User is None, skipping")
+        return
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Message media: %s", media_kind)
+        logger.debug("Text length: %d", len(text))
+        logger.debug("User ID: %s", user.id)
+        logger.debug("User name: %s %s", user.first_name, user.last_name or "")
+        logger.debug("Username: @%s", user.username or "N/A")
 
     # Check for hashtags and determine target topics
+    found_hashtags = {m.group(1).lower() for m in HASHTAG_RE.finditer(text)}
     target_topics = []
 
-    if "#biete" in text_lower:
-        logger.info("✓ Found #biete hashtag")
+    if "biete" in found_hashtags:
         target_topics.append(BIETE_TOPIC_ID)
-    else:
-        logger.debug("No #biete hashtag found")
 
-    if "#suche" in text_lower:
-        logger.info("✓ Found #suche hashtag")
+    if "suche" in found_hashtags:
         target_topics.append(SUCHE_TOPIC_ID)
-    else:
-        logger.debug("No #suche hashtag found")
 
     # If hashtags were found, forward the message and update user context
     if target_topics:
-        logger.info(f"Forwarding to topics: {target_topics}")
-
-        # Send text message if there's text content
-        if text.strip():
-            for topic_id in target_topics:
-                try:
-                    topic_name = "Biete" if topic_id == BIETE_TOPIC_ID else "Suche"
-                    logger.info(f"Attempting to send text to {topic_name} topic (ID: {topic_id})")
-                    result = await context.bot.send_message(
-                        chat_id=GROUP_ID,
-                        message_thread_id=topic_id,
-                        text=f"📨 Von {user_link}:\n\n{text}",
-                        parse_mode="Markdown"
-                    )
-                    logger.info(f"✓ Successfully sent text to {topic_name} topic. Message ID: {result.message_id}")
-                except Exception as e:
-                    logger.error(f"✗ ERROR sending text to topic {topic_id}: {type(e).__name__}: {e}", exc_info=True)
-
-        # Send media if present
-        if has_media:
-            for topic_id in target_topics:
-                await forward_media_to_topic(context, message, topic_id, user_link)
-
-        # Update user context
+        logger.debug("Found hashtags %s, forwarding to topics: %s", found_hashtags, target_topics)
+        await forward_to_topics(context, message, target_topics, text, media_kind)
         update_user_context(user.id, target_topics)
 
-    # If no hashtags found but message has content (text or media), check user context
-    elif has_media or text.strip():
-        logger.info("No hashtags found, but message has content. Checking user context...")
+    # If no hashtags found, check user context
+    else:
         active_topics = get_active_topics_for_user(user.id)
 
         if active_topics:
-            logger.info(f"User {user.id} has active context for topics: {active_topics}")
-
-            # Forward text if present
-            if text.strip():
-                for topic_id in active_topics:
-                    try:
-                        topic_name = "Biete" if topic_id == BIETE_TOPIC_ID else "Suche"
-                        logger.info(f"Attempting to send text to {topic_name} topic (ID: {topic_id}) based on context")
-                        result = await context.bot.send_message(
-                            chat_id=GROUP_ID,
-                            message_thread_id=topic_id,
-                            text=f"📨 Von {user_link}:\n\n{text}",
-                            parse_mode="Markdown"
-                        )
-                        logger.info(f"✓ Successfully sent text to {topic_name} topic. Message ID: {result.message_id}")
-                    except Exception as e:
-                        logger.error(f"✗ ERROR sending text to topic {topic_id}: {type(e).__name__}: {e}", exc_info=True)
-
-            # Forward media if present
-            if has_media:
-                for topic_id in active_topics:
-                    await forward_media_to_topic(context, message, topic_id, user_link)
+            logger.debug("No hashtags found, user %s has active context for topics: %s", user.id, active_topics)
+            await forward_to_topics(context, message, active_topics, text, media_kind)
         else:
-            logger.info(f"No active context for user {user.id}. Message will not be forwarded.")
-    
-    logger.info("Message processing complete")
-    logger.info("=" * 60)
+            logger.debug("No hashtags and no active context for user %s. Message will not be forwarded.", user.id)
+
+    logger.debug("Message processing complete")
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Log errors and exceptions"""
@@ -349,6 +355,36 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update:
         logger.error(f"Update that caused error: {update}")
 
+class TopicFilter(filters.MessageFilter):
+    """
+    Only let through messages posted in the given forum topic.
+    """
+    def __init__(self, thread_id: int):
+        super().__init__(name=f"TopicFilter({thread_id})")
+        self.thread_id = thread_id
+
+    def filter(self, message) -> bool:
+        return message.message_thread_id == self.thread_id
+
+# Let PTB drop everything handle_message would ignore before a handler task is created:
+# other chats and topics, edited messages and updates without forwardable content.
+FORWARD_FILTER = (
+    filters.Chat(chat_id=GROUP_ID)
+    & TopicFilter(HAUPTGRUPPE_TOPIC_ID)
+    & filters.UpdateType.MESSAGE
+    & (
+        filters.TEXT
+        | filters.CAPTION
+        | filters.PHOTO
+        | filters.VIDEO
+        | filters.Document.ALL
+        | filters.AUDIO
+        | filters.VOICE
+        | filters.VIDEO_NOTE
+        | filters.Sticker.ALL
+    )
+)
+
 def main():
     logger.info("=" * 60)
     logger.info("STARTING BOT")
@@ -360,18 +396,47 @@ def main():
     logger.info("=" * 60)
     
     try:
-        app = Application.builder().token(BOT_TOKEN).build()
+        app = (
+            Application.builder()
+            .token(BOT_TOKEN)
+            .connection_pool_size(CONNECTION_POOL_SIZE)
+            .pool_timeout(POOL_TIMEOUT)
+            .connect_timeout(CONNECT_TIMEOUT)
+            .read_timeout(READ_TIMEOUT)
+            .get_updates_connection_pool_size(GET_UPDATES_CONNECTION_POOL_SIZE)
+            .get_updates_pool_timeout(GET_UPDATES_POOL_TIMEOUT)
+            # Throttles to Telegram's global (30 msg/s) and per-group (20 msg/min)
+            # limits and retries on 429 Too Many Requests
+            .rate_limiter(AIORateLimiter(
+                overall_max_rate=30,
+                overall_time_period=1,
+                group_max_rate=20,
+                group_time_period=60,
+                max_retries=2
+            ))
+            .build()
+        )
         logger.info("Application builder created successfully")
         
-        app.add_handler(MessageHandler(filters.ALL, handle_message))
+        app.add_handler(MessageHandler(FORWARD_FILTER, handle_message))
         logger.info("Message handler added")
         
         app.add_error_handler(error_handler)
         logger.info("Error handler added")
         
-        logger.info("Bot is running and polling...")
         print("Bot is running...")
-        app.run_polling()
+        if USE_WEBHOOK:
+            logger.info(f"Bot is running with webhook on {WEBHOOK_LISTEN}:{PORT}...")
+            app.run_webhook(
+                listen=WEBHOOK_LISTEN,
+                port=PORT,
+                url_path=BOT_TOKEN,
+                webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{BOT_TOKEN}",
+                secret_token=WEBHOOK_SECRET
+            )
+        else:
+            logger.info("Bot is running and polling...")
+            app.run_polling()
     except Exception as e:
         logger.critical(f"FATAL ERROR in main(): {type(e).__name__}: {e}", exc_info=True)
         raise